@@ -1,7 +1,87 @@
+import os
 import sys
 import argparse
 import random
 import logging
+import multiprocessing
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    import numba
+    from numba import cuda, prange
+    from numba.cuda.random import (
+        create_xoroshiro128p_states,
+        xoroshiro128p_next,
+    )
+except ImportError:
+    numba = None
+    prange = range
+
+try:
+    # Built from bet_kernel.c by setup.py.
+    import bet_kernel
+except ImportError:
+    bet_kernel = None
+
+
+def njit(*args, **kwargs):
+    if numba is None:
+        return lambda f: f
+    return numba.njit(*args, **kwargs)
+
+
+def cuda_jit(*args, **kwargs):
+    if numba is None:
+        return lambda f: f
+    return cuda.jit(*args, **kwargs)
+
+
+def have_cuda():
+    return numba is not None and cuda.is_available()
+
+
+def exact_prob(p, start, target, bet_size):
+    """Gambler's ruin: probability of having target or more before having less
+    than bet_size, starting from start and always betting bet_size."""
+    a = start // bet_size
+    # Number of bet_size units needed to reach target, given that the
+    # remainder start % bet_size is never touched.
+    N = -((start % bet_size - target) // bet_size)
+    if a >= N:
+        return 1.0
+    if a == 0 or p == 0:
+        return 0.0
+    if p == 1:
+        return 1.0
+
+    q = 1 - p
+    if p == q:
+        return a / N
+    elif p > q:
+        r = q / p
+        return (1 - r**a) / (1 - r**N)
+    else:
+        # Same as above, rewritten in terms of p / q < 1 so that nothing
+        # overflows for large N.
+        r = p / q
+        return (r ** (N - a) - r**N) / (1 - r**N)
+
+
+def round_vec(fraction, x):
+    """round(fraction * x) for an integer array x, returned as x's dtype.
+
+    The product is taken in float64 even for int32 x: in float32, rounding it
+    already differs from round() for fractions like 0.14 and 0.07.
+    """
+    return np.rint(fraction * x.astype(np.float64)).astype(x.dtype)
+
+
+# Bet rules. Strategies are handed around as (name, kind, param) tuples.
+ALL, MIN, FIXED, FRACTION, CUM_FRACTION, KELLY = range(6)
 
 
 class Strategy:
@@ -12,48 +92,65 @@ class Strategy:
         self.min_bet = min_bet
         self.win_is_bet_amount = win_is_bet_amount
 
-    def should_bet_again(self, curr, total_bet):
-        if curr < self.min_bet:
-            return False
+    def should_bet_again_vec(self, curr, total_bet):
+        if self.win_is_bet_amount:
+            return (curr >= self.min_bet) & (total_bet < self.target)
+        else:
+            return (curr >= self.min_bet) & (curr < self.target)
 
+    def won_vec(self, curr, total_bet):
         if self.win_is_bet_amount:
-            return total_bet < self.target
+            return total_bet >= self.target
         else:
-            return curr < self.target
+            return curr >= self.target
+
+    def run(self, rand=random.random):
+        # This is the hot loop of the pure-Python engine, so everything it
+        # needs is looked up once, and the loop condition is
+        # should_bet_again_vec() written out for scalars.
+        p = self.p
+        target = self.target
+        min_bet = self.min_bet
+        win_is_bet_amount = self.win_is_bet_amount
+        get_next_bet = self.get_next_bet
 
-    def run(self):
         total_bet = 0
         curr = self.start
-        nsteps = 0
-
-        while self.should_bet_again(curr, total_bet):
-            bet = self.get_next_bet(curr, total_bet)
+        while curr >= min_bet and (
+            total_bet < target if win_is_bet_amount else curr < target
+        ):
+            bet = get_next_bet(curr, total_bet)
             if bet > curr:
                 break
-            bet = max(self.min_bet, bet)
-            nsteps += 1
+            if bet < min_bet:
+                bet = min_bet
             total_bet += bet
-            q = random.uniform(0, 1)
-            if self.p >= q:
+            if rand() < p:
                 curr += bet
             else:
                 curr -= bet
 
-        if self.win_is_bet_amount:
-            return total_bet >= self.target
+        if win_is_bet_amount:
+            return total_bet >= target
         else:
-            return curr >= self.target
+            return curr >= target
 
 
 class AllBetStragegy(Strategy):
     def get_next_bet(self, curr, total_bet):
         return curr
 
+    def get_next_bet_vec(self, curr, total_bet):
+        return curr
+
 
 class MinBetStragegy(Strategy):
     def get_next_bet(self, curr, total_bet):
         return self.min_bet
 
+    def get_next_bet_vec(self, curr, total_bet):
+        return np.full_like(curr, self.min_bet)
+
 
 class FixedBetStrategy(Strategy):
     def __init__(self, p, start, target, bet_size, min_bet=1, win_is_bet_amount=True):
@@ -65,6 +162,9 @@ class FixedBetStrategy(Strategy):
     def get_next_bet(self, curr, total_bet):
         return min(self.bet_size, curr)
 
+    def get_next_bet_vec(self, curr, total_bet):
+        return np.minimum(self.bet_size, curr)
+
 
 class FractionBetStrategy(Strategy):
     def __init__(self, p, start, target, fraction, min_bet=1, win_is_bet_amount=True):
@@ -76,6 +176,9 @@ class FractionBetStrategy(Strategy):
     def get_next_bet(self, curr, total_bet):
         return int(round(self.fraction * curr))
 
+    def get_next_bet_vec(self, curr, total_bet):
+        return round_vec(self.fraction, curr)
+
 
 class FractionCumulativeBetStrategy(Strategy):
     def __init__(self, p, start, target, fraction, min_bet=1, starting_bet=None, win_is_bet_amount=True):
@@ -93,8 +196,32 @@ class FractionCumulativeBetStrategy(Strategy):
 
         return int(round(self.fraction * total_bet))
 
+    def get_next_bet_vec(self, curr, total_bet):
+        return np.where(
+            total_bet == 0,
+            self.starting_bet,
+            round_vec(self.fraction, total_bet),
+        )
+
 
 class KellyBetStrategy(Strategy):
+    def __init__(self, p, start, target, min_bet=1, win_is_bet_amount=True):
+        super().__init__(
+            p, start, target, min_bet=min_bet, win_is_bet_amount=win_is_bet_amount
+        )
+        # Built by get_next_bet_vec() the first time it is needed.
+        self.half_left = None
+
+    def make_half_left(self, dtype):
+        # With the target on the total bet, the bet is
+        # min(curr, target - total_bet, half_left[curr + total_bet]): half of
+        # what is left to bet while that is more than curr, no limit after.
+        # Indexes are clipped to target, the first "no limit" entry.
+        s = np.arange(self.target + 1, dtype=dtype)
+        half_left = (self.target - s + 1) // 2
+        half_left[self.target] = self.target
+        return half_left
+
     def get_next_bet(self, curr, total_bet):
         if self.win_is_bet_amount:
             if curr >= self.target - total_bet:
@@ -105,42 +232,597 @@ class KellyBetStrategy(Strategy):
         else:
             return min(curr, self.target - curr)
 
-
-def run_strategy(name, strategy, n):
+    def get_next_bet_vec(self, curr, total_bet):
+        if self.win_is_bet_amount:
+            if self.half_left is None:
+                # Same dtype as the state, which holds target, so nothing is
+                # widened when the table is used.
+                self.half_left = self.make_half_left(curr.dtype)
+            half = self.half_left[np.minimum(curr + total_bet, self.target)]
+            return np.minimum(np.minimum(curr, self.target - total_bet), half)
+        else:
+            return np.minimum(curr, self.target - curr)
+
+
+def make_strategy(kind, param, p, start, target, min_bet, win_is_bet_amount):
+    """Build the Strategy object for the engines that need one."""
+    a = (p, start, target)
+    kw = {"min_bet": min_bet, "win_is_bet_amount": win_is_bet_amount}
+    if kind == ALL:
+        return AllBetStragegy(*a, **kw)
+    elif kind == MIN:
+        return MinBetStragegy(*a, **kw)
+    elif kind == FIXED:
+        return FixedBetStrategy(*a, **kw, bet_size=param)
+    elif kind == FRACTION:
+        return FractionBetStrategy(*a, **kw, fraction=param)
+    elif kind == CUM_FRACTION:
+        return FractionCumulativeBetStrategy(*a, **kw, fraction=param)
+    else:
+        return KellyBetStrategy(*a, **kw)
+
+
+def kernel_params(kind, param, min_bet):
+    """Split param into the kernels' bet_size and fraction arguments."""
+    if kind == FIXED:
+        return param, 0.0
+    elif kind == FRACTION:
+        return 0, param
+    elif kind == CUM_FRACTION:
+        # The starting bet goes in the bet_size slot.
+        return min_bet, param
+    else:
+        return 0, 0.0
+
+
+def win_probability(kind, param, p, start, target, min_bet, win_is_bet_amount):
+    """Exact probability that the strategy wins, or None if there is no closed
+    form."""
+    if win_is_bet_amount:
+        return None
+    if kind == MIN:
+        return exact_prob(p, start, target, min_bet)
+    # Fixed bets are only a plain random walk if we never have to go all in
+    # with less than bet_size.
+    if kind == FIXED and start % param == 0 and param >= min_bet:
+        return exact_prob(p, start, target, param)
+    return None
+
+
+# No signatures: the kernels call these on scalars, the numpy engine on arrays.
+@njit(cache=True)
+def pcg32(state, inc):
+    """One step of the PCG32 generator (pcg-random.org) that bet_kernel.c uses.
+    Returns the new state and 32 random bits, both as uint64."""
+    mask = np.uint64(0xFFFFFFFF)
+    new_state = state * np.uint64(6364136223846793005) + inc
+    xorshifted = (((state >> np.uint64(18)) ^ state) >> np.uint64(27)) & mask
+    rot = state >> np.uint64(59)
+    out = (xorshifted >> rot) | (xorshifted << ((np.uint64(32) - rot) & np.uint64(31)))
+    return new_state, out & mask
+
+
+@njit(cache=True)
+def pcg32_seed(seed, inc):
+    """Initial PCG32 state for seed on the stream given by inc (odd)."""
+    state, _ = pcg32(np.uint64(0), inc)
+    state, _ = pcg32(state + seed, inc)
+    return state
+
+
+# The kernels are given explicit signatures so that they are compiled when the
+# module is imported rather than in the middle of the run, and cached on disk so
+# that later runs skip compilation entirely.
+
+
+@njit("uint64(float64)", cache=True)
+def win_threshold(p):
+    """Return t such that a uniform 32-bit r wins a bet of odds p iff r < t.
+
+    t is 64-bit, so that p == 0 never wins and p == 1 always does, and
+    unsigned like the draws, so that comparing them stays in integers.
+    """
+    return np.uint64(min(max(round(p * 2**32), 0), 2**32))
+
+
+@njit(
+    "int64(int64, int64, int64, int64, int64, int64, float64, boolean)",
+    cache=True,
+    fastmath=True,
+)
+def next_bet(
+    kind, curr, total_bet, target, min_bet, bet_size, fraction, win_is_bet_amount
+):
+    if kind == ALL:
+        return curr
+    elif kind == MIN:
+        return min_bet
+    elif kind == FIXED:
+        return min(bet_size, curr)
+    elif kind == FRACTION:
+        return int(round(fraction * curr))
+    elif kind == CUM_FRACTION:
+        if total_bet == 0:
+            return bet_size
+        return int(round(fraction * total_bet))
+    elif win_is_bet_amount:
+        if curr >= target - total_bet:
+            return target - total_bet
+        return min((target - total_bet - curr + 1) // 2, curr)
+    else:
+        return min(curr, target - curr)
+
+
+@njit(
+    "int64(int64, float64, int64, int64, int64, int64, float64, boolean, int64,"
+    " int64)",
+    cache=True,
+    fastmath=True,
+)
+def run_kernel(
+    kind, p, start, target, min_bet, bet_size, fraction, win_is_bet_amount, n, seed
+):
+    """Same as calling Strategy.run() n times, without the Python overhead."""
+    threshold = win_threshold(p)
     nwins = 0
-    logging.debug("Running %s", name)
     for i in range(n):
-        if strategy.run():
+        inc = (np.uint64(i) << np.uint64(1)) | np.uint64(1)
+        state = pcg32_seed(np.uint64(seed), inc)
+        total_bet = 0
+        curr = start
+        while curr >= min_bet and (
+            total_bet < target if win_is_bet_amount else curr < target
+        ):
+            bet = next_bet(
+                kind,
+                curr,
+                total_bet,
+                target,
+                min_bet,
+                bet_size,
+                fraction,
+                win_is_bet_amount,
+            )
+            if bet > curr:
+                break
+            bet = max(min_bet, bet)
+            total_bet += bet
+            state, r = pcg32(state, inc)
+            curr += bet if r < threshold else -bet
+
+        if win_is_bet_amount:
+            if total_bet >= target:
+                nwins += 1
+        elif curr >= target:
             nwins += 1
+    return nwins
+
+
+@njit(
+    "int64[:](int64, float64[:], float64, int64, int64, int64, int64, boolean,"
+    " int64, int64)",
+    cache=True,
+    fastmath=True,
+    parallel=True,
+)
+def sweep_kernel(
+    kind, fractions, p, start, target, min_bet, bet_size, win_is_bet_amount, n, seed
+):
+    """run_kernel() for each of fractions, in parallel.
+
+    Trials are seeded the same way for every fraction, so the sweep keeps
+    using common random numbers.
+    """
+    nwins = np.zeros(len(fractions), dtype=np.int64)
+    for i in prange(len(fractions)):
+        nwins[i] = run_kernel(
+            kind,
+            p,
+            start,
+            target,
+            min_bet,
+            bet_size,
+            fractions[i],
+            win_is_bet_amount,
+            n,
+            seed,
+        )
+    return nwins
+
+
+def run_sweeps(strategies, game, n, seed):
+    """Run the fraction strategies among strategies, one sweep_kernel() call
+    per rule, and return {name: nwins}."""
+    p, start, target, min_bet, win_is_bet_amount = game
+    results = {}
+    for kind in (FRACTION, CUM_FRACTION):
+        group = [(name, param) for name, k, param in strategies if k == kind]
+        if not group:
+            continue
+        logging.debug("Sweeping %s to %s", group[0][0], group[-1][0])
+        bet_size, _ = kernel_params(kind, 0.0, min_bet)
+        nwins = sweep_kernel(
+            kind,
+            np.array([param for _, param in group]),
+            p,
+            start,
+            target,
+            min_bet,
+            bet_size,
+            win_is_bet_amount,
+            n,
+            seed,
+        )
+        results.update(zip((name for name, _ in group), (int(x) for x in nwins)))
+    return results
+
+
+@njit(
+    [
+        f"int64({t}[:], {t}[:], boolean[:], uint64[:], uint64[:], uint64, int64,"
+        " int64, int64, int64, float64, boolean)"
+        for t in ("int32", "int64")
+    ],
+    cache=True,
+    fastmath=True,
+    parallel=True,
+)
+def batch_step(
+    curr,
+    total_bet,
+    alive,
+    rng_state,
+    rng_inc,
+    threshold,
+    kind,
+    target,
+    min_bet,
+    bet_size,
+    fraction,
+    win_is_bet_amount,
+):
+    """BatchState.step() as a single pass over the trials, each one updated in
+    registers. Returns the number of trials still alive.
+
+    next_bet() rounds fractions in float64 like round_vec(), and draws come
+    from the same streams, so this makes exactly the bets the numpy chain does.
+    """
+    nalive = 0
+    for i in prange(len(curr)):
+        if alive[i]:
+            c = curr[i]
+            t = total_bet[i]
+            bet = next_bet(
+                kind, c, t, target, min_bet, bet_size, fraction, win_is_bet_amount
+            )
+            if bet > c:
+                alive[i] = False
+            else:
+                bet = max(min_bet, bet)
+                t += bet
+                rng_state[i], r = pcg32(rng_state[i], rng_inc[i])
+                c += bet if r < threshold else -bet
+                curr[i] = c
+                total_bet[i] = t
+                if c >= min_bet and (t < target if win_is_bet_amount else c < target):
+                    nalive += 1
+                else:
+                    alive[i] = False
+    return nalive
+
+
+class BatchState:
+    """n trials of strategy, stored as one array per field so that each step
+    is a handful of straight passes over contiguous integer arrays.
+
+    rng_state and rng_inc hold each trial's generator. Finished trials are
+    frozen in place, and dropped from the arrays once a quarter of them are
+    finished, so that the work per step follows the number of live trials.
+    Until a trial is dropped, batch_step() skips it, but the numpy chain still
+    passes over it and advances its generator, up to a quarter of the rows.
+    wins counts the dropped trials that won.
+
+    When given the strategy's (kind, bet_size, fraction), steps are done by
+    batch_step() instead of a chain of numpy operations.
+    """
+
+    def __init__(self, strategy, n, seed, kernel_args=None):
+        self.strategy = strategy
+        self.kernel_args = kernel_args
+        self.threshold = win_threshold(strategy.p)
+        dtype = self.dtype(strategy.start, strategy.target)
+        self.curr = np.full(n, strategy.start, dtype=dtype)
+        self.total_bet = np.zeros(n, dtype=dtype)
+        self.alive = strategy.should_bet_again_vec(self.curr, self.total_bet)
+        self.nalive = int(np.count_nonzero(self.alive))
+        self.rng_inc = (np.arange(n, dtype=np.uint64) << np.uint64(1)) | np.uint64(1)
+        self.rng_state = pcg32_seed(np.uint64(seed % 2**64), self.rng_inc)
+        self.wins = 0
+
+    @staticmethod
+    def dtype(start, target):
+        # Neither curr nor total_bet gets past 3 * (start + target). Below 2**30
+        # even their sum fits in int32, which halves the memory traffic.
+        if 3 * (start + target) < 2**30:
+            return np.int32
+        return np.int64
+
+    def step(self):
+        """Place one bet in every live trial."""
+        strategy = self.strategy
+        curr = self.curr
+        total_bet = self.total_bet
+        alive = self.alive
+
+        if self.kernel_args is not None:
+            kind, bet_size, fraction = self.kernel_args
+            self.nalive = batch_step(
+                curr,
+                total_bet,
+                alive,
+                self.rng_state,
+                self.rng_inc,
+                self.threshold,
+                kind,
+                strategy.target,
+                strategy.min_bet,
+                bet_size,
+                fraction,
+                strategy.win_is_bet_amount,
+            )
+        else:
+            bet = strategy.get_next_bet_vec(curr, total_bet)
+            alive &= bet <= curr
+            bet = np.where(alive, np.maximum(strategy.min_bet, bet), 0)
+            self.rng_state, r = pcg32(self.rng_state, self.rng_inc)
+            curr += np.where(r < self.threshold, bet, -bet)
+            total_bet += bet
+            alive &= strategy.should_bet_again_vec(curr, total_bet)
+            self.nalive = int(np.count_nonzero(alive))
+
+        if self.nalive <= 3 * len(alive) // 4:
+            self.compact()
+
+    def compact(self):
+        done = ~self.alive
+        won = self.strategy.won_vec(self.curr[done], self.total_bet[done])
+        self.wins += int(np.count_nonzero(won))
+
+        self.curr = self.curr[self.alive]
+        self.total_bet = self.total_bet[self.alive]
+        self.rng_state = self.rng_state[self.alive]
+        self.rng_inc = self.rng_inc[self.alive]
+        self.alive = np.ones(len(self.curr), dtype=bool)
+
+    def nwins(self):
+        won = self.strategy.won_vec(self.curr, self.total_bet)
+        return self.wins + int(np.count_nonzero(won))
+
+
+def run_batch(strategy, n, seed, kernel_args=None):
+    """Run all n trials of strategy in lock step, one BatchState.step() per
+    bet: a single batch_step() pass when given kernel_args, a chain of numpy
+    operations otherwise."""
+    state = BatchState(strategy, n, seed, kernel_args)
+    while state.nalive:
+        state.step()
+    return state.nwins()
+
+
+@cuda_jit
+def mc_kernel(
+    rng_states,
+    kinds,
+    bet_sizes,
+    fractions,
+    threshold,
+    start,
+    target,
+    min_bet,
+    win_is_bet_amount,
+    n,
+    nwins_out,
+):
+    """One thread plays one trial of one strategy; strategy s owns threads
+    s * n to (s + 1) * n - 1."""
+    tid = cuda.grid(1)
+    if tid >= rng_states.shape[0]:
+        return
+    s = tid // n
+    kind = kinds[s]
+    bet_size = bet_sizes[s]
+    fraction = fractions[s]
+
+    total_bet = 0
+    curr = start
+    while curr >= min_bet and (
+        total_bet < target if win_is_bet_amount else curr < target
+    ):
+        bet = next_bet(
+            kind,
+            curr,
+            total_bet,
+            target,
+            min_bet,
+            bet_size,
+            fraction,
+            win_is_bet_amount,
+        )
+        if bet > curr:
+            break
+        bet = max(min_bet, bet)
+        total_bet += bet
+        # The top 32 bits of the draw, against win_threshold(p).
+        if xoroshiro128p_next(rng_states, tid) >> np.uint64(32) < threshold:
+            curr += bet
+        else:
+            curr -= bet
+
+    if total_bet >= target if win_is_bet_amount else curr >= target:
+        cuda.atomic.add(nwins_out, s, 1)
+
+
+def run_cuda(strategies, game, n, seed):
+    """Run n trials of every strategy on the GPU, returning the list of nwins."""
+    p, start, target, min_bet, win_is_bet_amount = game
+    params = [kernel_params(kind, param, min_bet) for _, kind, param in strategies]
+    kinds = np.array([kind for _, kind, _ in strategies], dtype=np.int64)
+    bet_sizes = np.array([bet_size for bet_size, _ in params], dtype=np.int64)
+    fractions = np.array([fraction for _, fraction in params], dtype=np.float64)
+
+    # The n trial streams, tiled once per strategy.
+    states = create_xoroshiro128p_states(n, seed).copy_to_host()
+    rng_states = cuda.to_device(np.tile(states, len(strategies)))
+    nwins = cuda.to_device(np.zeros(len(strategies), dtype=np.int64))
+
+    threads = 256
+    blocks = (len(rng_states) + threads - 1) // threads
+    mc_kernel[blocks, threads](
+        rng_states,
+        cuda.to_device(kinds),
+        cuda.to_device(bet_sizes),
+        cuda.to_device(fractions),
+        np.uint64(win_threshold(p)),
+        start,
+        target,
+        min_bet,
+        win_is_bet_amount,
+        n,
+        nwins,
+    )
+    return [int(x) for x in nwins.copy_to_host()]
+
+
+def run_strategy(name, kind, param, game, n, seed, engine="python"):
+    nwins = 0
+    logging.debug("Running %s", name)
+    if engine in ("numba", "c"):
+        p, start, target, min_bet, win_is_bet_amount = game
+        bet_size, fraction = kernel_params(kind, param, min_bet)
+        kernel = bet_kernel.run_kernel if engine == "c" else run_kernel
+        nwins = kernel(
+            kind,
+            p,
+            start,
+            target,
+            min_bet,
+            bet_size,
+            fraction,
+            win_is_bet_amount,
+            n,
+            seed,
+        )
+    elif engine == "numpy":
+        strategy = make_strategy(kind, param, *game)
+        kernel_args = None
+        if numba is not None:
+            kernel_args = (kind, *kernel_params(kind, param, strategy.min_bet))
+        nwins = run_batch(strategy, n, seed, kernel_args)
+    else:
+        strategy = make_strategy(kind, param, *game)
+        rand = random.Random(seed).random
+        for i in range(n):
+            if strategy.run(rand):
+                nwins += 1
     logging.debug("%s done", name)
     return nwins
 
 
+def init_worker():
+    if numba is not None:
+        numba.set_num_threads(1)
+
+
+def run_strategies(strategies, n, engine, exact=True, jobs=1):
+    """Yield (name, nwins) for every strategy in strategies.
+
+    Strategies with a closed form win probability are not simulated when exact
+    is set; their nwins is the expected number of wins instead. With jobs > 1,
+    the strategies that run_strategy() handles are spread over that many
+    processes.
+    """
+    seed = strategies.seed
+    game = strategies.game
+    done = {}
+    if exact:
+        for name, kind, param in strategies:
+            prob = win_probability(kind, param, *game)
+            if prob is not None:
+                done[name] = round(prob * n)
+
+    if engine == "cuda":
+        todo = [s for s in strategies if s[0] not in done]
+        logging.debug("Running %d strategies on the GPU", len(todo))
+        nwins = run_cuda(todo, game, n, seed)
+        done.update(zip((name for name, _, _ in todo), nwins))
+    elif engine == "numba":
+        todo = [s for s in strategies if s[0] not in done]
+        done.update(run_sweeps(todo, game, n, seed))
+
+    todo = [s for s in strategies if s[0] not in done]
+    if jobs > 1 and engine != "cuda" and todo:
+        # Trials are seeded explicitly, so results don't depend on which
+        # worker ran what. Workers are spawned rather than forked, as numba's
+        # threading layer does not survive a fork, and their numba kernels are
+        # kept to one thread each, the pool being what uses the cores.
+        tasks = [(*s, game, n, seed, engine) for s in todo]
+        ctx = multiprocessing.get_context("spawn")
+        with ctx.Pool(min(jobs, len(todo)), initializer=init_worker) as pool:
+            results = pool.starmap(run_strategy, tasks)
+        done.update(zip((name for name, _, _ in todo), results))
+
+    for name, kind, param in strategies:
+        if name in done:
+            yield name, done[name]
+        else:
+            yield name, run_strategy(name, kind, param, game, n, seed, engine)
+
+
+def resolve_engine(engine):
+    if engine != "auto":
+        return engine
+    if have_cuda():
+        return "cuda"
+    if bet_kernel is not None:
+        return "c"
+    if numba is not None:
+        return "numba"
+    if np is not None:
+        return "numpy"
+    return "python"
+
+
 class StrategiesToRun:
+    """The (name, kind, param) of every strategy, and the game they all play."""
+
     def __init__(self, args):
         self.args = args
-        a = (args.probability, args.start, args.target)
-        kw = {"win_is_bet_amount": args.win_is_bet}
-        strategies = {
-            "all": AllBetStragegy(*a, **kw),
-            "min": MinBetStragegy(*a, **kw),
-        }
+        # (p, start, target, min_bet, win_is_bet_amount)
+        self.game = (args.probability, args.start, args.target, 1, args.win_is_bet)
+        strategies = [("all", ALL, 0), ("min", MIN, 0)]
         for bet_size in range(1, args.start + 1):
-            strategies[f"fixed_{bet_size}"] = FixedBetStrategy(
-                *a, **kw, bet_size=bet_size
-            )
+            strategies.append((f"fixed_{bet_size}", FIXED, bet_size))
         for fraction in range(1, 101):
-            strategies[f"fraction_{fraction}"] = FractionBetStrategy(
-                *a, **kw, fraction=fraction / 100.0
-            )
+            strategies.append((f"fraction_{fraction}", FRACTION, fraction / 100.0))
         for fraction in range(1, 101):
-            strategies[f"cum_fraction_{fraction}"] = FractionCumulativeBetStrategy(
-                *a, **kw, fraction=fraction / 100.0
+            strategies.append(
+                (f"cum_fraction_{fraction}", CUM_FRACTION, fraction / 100.0)
             )
 
-        strategies["kelly"] = KellyBetStrategy(*a, **kw)
+        strategies.append(("kelly", KELLY, 0))
         self.strategies = strategies
 
+        # All strategies are run with the same random numbers, so that their
+        # differences are not drowned in sampling noise: trial i of every
+        # strategy draws from stream i of a generator seeded with seed (PCG32,
+        # or xoroshiro128+ on the GPU), which is much cheaper than reseeding a
+        # Mersenne Twister per trial. The pure-Python engine just starts every
+        # strategy from the same random.Random(seed).
+        if args.seed is None:
+            self.seed = random.getrandbits(32)
+        else:
+            self.seed = args.seed
+
     def __iter__(self):
         return iter(self.strategies)
 
@@ -153,19 +835,23 @@ def setup_logging(debug=False):
 def run(args):
     setup_logging(debug=args.debug)
     strategies = StrategiesToRun(args)
-    args.outfile.write(f"name,nwins,n,ratio\n")
+    rows = []
     best = None
     best_nwins = 0
     n = args.num_rounds
-    for name in strategies:
-        strategy = strategies.strategies[name]
-        nwins = run_strategy(name, strategy, n)
+    engine = resolve_engine(args.engine)
+    results = run_strategies(strategies, n, engine, args.exact, args.jobs)
+    for name, nwins in results:
         if nwins > best_nwins:
             best_nwins = nwins
             best = name
-        msg = f"{name},{nwins},{n},{nwins / n}"
-        args.outfile.write("%s\n" % (msg,))
-        logging.info("%s", msg)
+        rows.append(f"{name},{nwins},{n},{nwins / n}")
+
+    # One write for the whole file, and one log record for all the rows,
+    # rather than a small one of each per strategy.
+    table = "\n".join(rows)
+    args.outfile.write(f"name,nwins,n,ratio\n{table}\n")
+    logging.info("%s", table)
 
     sys.stdout.write(f"Best: {best} {best_nwins} {n}\n")
 
@@ -180,14 +866,44 @@ def main():
         default=False,
         help="use total bet amount for target, instead of the total amount in hand",
     )
-    parser.add_argument("-n", "--num-rounds", default=10000)
-    parser.add_argument("-p", "--probability", default=0.4)
-    parser.add_argument("-s", "--start", default=2000)
-    parser.add_argument("-t", "--target", default=10000)
+    parser.add_argument("-n", "--num-rounds", type=int, default=10000)
+    parser.add_argument("-p", "--probability", type=float, default=0.4)
+    parser.add_argument("-s", "--start", type=int, default=2000)
+    parser.add_argument("-t", "--target", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument(
+        "--no-exact",
+        dest="exact",
+        action="store_false",
+        default=True,
+        help="simulate strategies even when their win probability has a closed form",
+    )
+    parser.add_argument(
+        "-e",
+        "--engine",
+        choices=["auto", "python", "numpy", "numba", "cuda", "c"],
+        default="auto",
+        help="how to run the trials; auto picks the fastest one installed",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=os.cpu_count(),
+        help="number of processes to run strategies in",
+    )
     parser.add_argument(
         "outfile", nargs="?", type=argparse.FileType("w"), default=sys.stdout
     )
     args = parser.parse_args()
+    if args.engine == "numpy" and np is None:
+        parser.error("the numpy engine needs numpy installed")
+    if args.engine == "numba" and numba is None:
+        parser.error("the numba engine needs numba installed")
+    if args.engine == "cuda" and not have_cuda():
+        parser.error("the cuda engine needs numba and a CUDA GPU")
+    if args.engine == "c" and bet_kernel is None:
+        parser.error("the c engine needs bet_kernel, see setup.py")
     run(args)
 
 
@@ -0,0 +1,150 @@
+/*
+ * C version of bet.run_kernel(), for the "c" engine.
+ *
+ * Build with: python setup.py build_ext --inplace
+ */
+#define PY_SSIZE_T_CLEAN
+#include <Python.h>
+
+#include <math.h>
+#include <stdint.h>
+
+/* Same tags as in bet.py. */
+enum { ALL, MIN, FIXED, FRACTION, CUM_FRACTION, KELLY };
+
+/*
+ * PCG32 (pcg-random.org): 64 bits of state, 32 bits out, and a stream
+ * selector, which gives every trial its own sequence.
+ */
+typedef struct {
+    uint64_t state;
+    uint64_t inc;
+} pcg32_t;
+
+static inline uint32_t pcg32(pcg32_t *rng)
+{
+    uint64_t old = rng->state;
+    rng->state = old * 6364136223846793005ULL + rng->inc;
+    uint32_t xorshifted = (uint32_t)(((old >> 18u) ^ old) >> 27u);
+    uint32_t rot = (uint32_t)(old >> 59u);
+    return (xorshifted >> rot) | (xorshifted << ((-rot) & 31));
+}
+
+static inline void pcg32_seed(pcg32_t *rng, uint64_t seed, uint64_t stream)
+{
+    rng->state = 0;
+    rng->inc = (stream << 1u) | 1u;
+    pcg32(rng);
+    rng->state += seed;
+    pcg32(rng);
+}
+
+static inline int64_t min64(int64_t a, int64_t b)
+{
+    return a < b ? a : b;
+}
+
+static inline int64_t next_bet(int kind, int64_t curr, int64_t total_bet,
+                               int64_t target, int64_t min_bet,
+                               int64_t bet_size, double fraction,
+                               int win_is_bet_amount)
+{
+    switch (kind) {
+    case ALL:
+        return curr;
+    case MIN:
+        return min_bet;
+    case FIXED:
+        return min64(bet_size, curr);
+    case FRACTION:
+        return (int64_t)rint(fraction * curr);
+    case CUM_FRACTION:
+        if (total_bet == 0)
+            return bet_size;
+        return (int64_t)rint(fraction * total_bet);
+    default:
+        if (win_is_bet_amount) {
+            if (curr >= target - total_bet)
+                return target - total_bet;
+            return min64((target - total_bet - curr + 1) / 2, curr);
+        }
+        return min64(curr, target - curr);
+    }
+}
+
+static int64_t run_kernel(int kind, double p, int64_t start, int64_t target,
+                          int64_t min_bet, int64_t bet_size, double fraction,
+                          int win_is_bet_amount, int64_t n, uint64_t seed)
+{
+    /*
+     * A uniform 32-bit r is below threshold with probability p, as in
+     * win_threshold(). Clamping before the cast keeps it defined for p
+     * outside [0, 1], and 64 bits let p == 1 always win.
+     */
+    double t = rint(p * 4294967296.0);
+    uint64_t threshold = !(t > 0.0) ? 0
+                         : t >= 4294967296.0 ? 4294967296ULL
+                                             : (uint64_t)t;
+    int64_t nwins = 0;
+
+    for (int64_t i = 0; i < n; i++) {
+        pcg32_t rng;
+        int64_t total_bet = 0;
+        int64_t curr = start;
+
+        pcg32_seed(&rng, seed, (uint64_t)i);
+        while (curr >= min_bet &&
+               (win_is_bet_amount ? total_bet < target : curr < target)) {
+            int64_t bet = next_bet(kind, curr, total_bet, target, min_bet,
+                                   bet_size, fraction, win_is_bet_amount);
+            if (bet > curr)
+                break;
+            if (bet < min_bet)
+                bet = min_bet;
+            total_bet += bet;
+            /* Add bet on a win and subtract it on a loss, without a branch. */
+            curr += bet - ((int64_t)(pcg32(&rng) >= threshold) << 1) * bet;
+        }
+
+        nwins += win_is_bet_amount ? total_bet >= target : curr >= target;
+    }
+    return nwins;
+}
+
+static PyObject *py_run_kernel(PyObject *self, PyObject *args)
+{
+    int kind, win_is_bet_amount;
+    double p, fraction;
+    long long start, target, min_bet, bet_size, n;
+    unsigned long long seed;
+    int64_t nwins;
+
+    if (!PyArg_ParseTuple(args, "idLLLLdpLK", &kind, &p, &start, &target,
+                          &min_bet, &bet_size, &fraction, &win_is_bet_amount,
+                          &n, &seed))
+        return NULL;
+
+    Py_BEGIN_ALLOW_THREADS
+    nwins = run_kernel(kind, p, start, target, min_bet, bet_size, fraction,
+                       win_is_bet_amount, n, seed);
+    Py_END_ALLOW_THREADS
+
+    return PyLong_FromLongLong(nwins);
+}
+
+static PyMethodDef methods[] = {
+    {"run_kernel", py_run_kernel, METH_VARARGS,
+     "run_kernel(kind, p, start, target, min_bet, bet_size, fraction, "
+     "win_is_bet_amount, n, seed)\n\n"
+     "Same as bet.run_kernel(), with a PCG32 stream per trial."},
+    {NULL, NULL, 0, NULL},
+};
+
+static struct PyModuleDef module = {
+    PyModuleDef_HEAD_INIT, "bet_kernel", NULL, -1, methods,
+};
+
+PyMODINIT_FUNC PyInit_bet_kernel(void)
+{
+    return PyModule_Create(&module);
+}
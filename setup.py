@@ -0,0 +1,15 @@
+from setuptools import Extension, setup
+
+# Only needed for the "c" engine. Build in place with:
+#     python setup.py build_ext --inplace
+setup(
+    name="bet",
+    py_modules=["bet"],
+    ext_modules=[
+        Extension(
+            "bet_kernel",
+            ["bet_kernel.c"],
+            extra_compile_args=["-O3", "-march=native", "-ffast-math"],
+        )
+    ],
+)